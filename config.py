@@ -1,14 +1,25 @@
 import os
+import functools
 from dotenv import load_dotenv
-from typing import List
+from typing import List, NamedTuple, Optional
 
-load_dotenv()
+# run.py already loaded .env (from its parse cache) when this is set
+if not os.getenv('NEET_BOT_ENV_LOADED'):
+    load_dotenv()
+
+class ConfigSnapshot(NamedTuple):
+    """The settings the bot can't start without"""
+    BOT_TOKEN: Optional[str]
+    ADMIN_IDS: frozenset
+    CHANNEL_ID: int
 
 class Config:
     BOT_TOKEN = os.getenv('BOT_TOKEN')
-    ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()]
+    # frozenset so the per-message admin check is a constant-time lookup
+    ADMIN_IDS = frozenset(int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip())
     CHANNEL_ID = int(os.getenv('CHANNEL_ID', '0'))
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    USER_DB_PATH = os.getenv('USER_DB_PATH', 'users.db')
     
     VULGAR_WORDS = [
         # Vulgar and inappropriate content
@@ -39,4 +50,10 @@ class Config:
     SCREENSHOT_INDICATORS = [
         #"report admin", "report channel", "scam", "fraud", 
         #"false report", "ban channel", "shut down", "report group"
-    ]
\ No newline at end of file
+    ]
+    
+    @classmethod
+    @functools.lru_cache(maxsize=None)  # functools.cache needs Python 3.9
+    def snapshot(cls) -> ConfigSnapshot:
+        """Required settings gathered once, for startup validation"""
+        return ConfigSnapshot(cls.BOT_TOKEN, cls.ADMIN_IDS, cls.CHANNEL_ID)
@@ -1,37 +1,36 @@
 import re
 import logging
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from config import Config
 
 logger = logging.getLogger(__name__)
 
 class ContentFilter:
     def __init__(self):
-        self.vulgar_patterns = self._compile_patterns(Config.VULGAR_WORDS)
-        self.competitor_patterns = self._compile_patterns(Config.COMPETITOR_KEYWORDS)
-        self.screenshot_patterns = self._compile_patterns(Config.SCREENSHOT_INDICATORS)
-        
-    def _compile_patterns(self, words: List[str]) -> List[re.Pattern]:
-        patterns = []
-        for word in words:
-            pattern = re.compile(rf'\b{re.escape(word)}\b', re.IGNORECASE)
-            patterns.append(pattern)
-        return patterns
+        self.vulgar_pattern = self._compile_patterns(Config.VULGAR_WORDS)
+        self.competitor_pattern = self._compile_patterns(Config.COMPETITOR_KEYWORDS)
+        self.screenshot_pattern = self._compile_patterns(Config.SCREENSHOT_INDICATORS)
+        
+    def _compile_patterns(self, words: List[str]) -> Optional[re.Pattern]:
+        """Compile a keyword list into one alternation regex so each message is scanned once per category"""
+        # Longest first so multi-word phrases win over their prefixes; drop duplicates
+        unique_words = sorted(set(word.lower() for word in words), key=len, reverse=True)
+        if not unique_words:
+            return None
+        alternation = '|'.join(re.escape(word) for word in unique_words)
+        return re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE)
+    
+    def _find_keywords(self, pattern: Optional[re.Pattern], text: str) -> List[str]:
+        if pattern is None or not text:
+            return []
+        return pattern.findall(text)
     
     def check_vulgar_content(self, text: str) -> Tuple[bool, List[str]]:
-        found_words = []
-        for pattern in self.vulgar_patterns:
-            matches = pattern.findall(text)
-            found_words.extend(matches)
-        
+        found_words = self._find_keywords(self.vulgar_pattern, text)
         return len(found_words) > 0, found_words
     
     def check_competitor_content(self, text: str) -> Tuple[bool, List[str]]:
-        found_words = []
-        for pattern in self.competitor_patterns:
-            matches = pattern.findall(text)
-            found_words.extend(matches)
-        
+        found_words = self._find_keywords(self.competitor_pattern, text)
         return len(found_words) > 0, found_words
     
     def check_screenshot_threat(self, text: str) -> Tuple[bool, List[str]]:
@@ -54,11 +53,7 @@ class ContentFilter:
             return False, []
         
         # Only flag if contains threat indicators without educational context
-        found_words = []
-        for pattern in self.screenshot_patterns:
-            matches = pattern.findall(text)
-            found_words.extend(matches)
-        
+        found_words = self._find_keywords(self.screenshot_pattern, text)
         return len(found_words) > 0, found_words
     
     def check_spam_patterns(self, text: str) -> bool:
@@ -5,7 +5,7 @@ import io
 import logging
 import os
 import glob
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Union, BinaryIO
 
 logger = logging.getLogger(__name__)
 
@@ -57,9 +57,11 @@ class ImageAnalyzer:
         
         logger.info(f"Loaded {len(self.logo_templates)} competitor logo templates")
     
-    def analyze_image(self, image_data: bytes, caption: str = "") -> Dict[str, any]:
+    def analyze_image(self, image_data: Union[bytes, bytearray, memoryview, BinaryIO], caption: str = "") -> Dict[str, any]:
         try:
-            image = Image.open(io.BytesIO(image_data))
+            # Read a stream (e.g. the buffer the photo was downloaded into) in place instead of copying it
+            stream = image_data if hasattr(image_data, "read") else io.BytesIO(image_data)
+            image = Image.open(stream)
             
             # Check if this appears to be educational content
             is_educational = self._is_educational_content(caption)
@@ -1,12 +1,17 @@
+import io
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import time
 from telegram import Update, Message, ChatMemberUpdated
 from telegram.ext import Application, CommandHandler, MessageHandler, ChatMemberHandler, filters, ContextTypes
 from telegram.constants import ParseMode, ChatMemberStatus
+from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.request import HTTPXRequest
 from config import Config
 from content_filter import ContentFilter
 from image_analyzer import ImageAnalyzer
+from rate_limiter import TelegramRateLimiter
+from user_store import LRUDict, UserState, UserDatabase
 import aiofiles
 import re
 
@@ -16,30 +21,153 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Timer deletion commands: /60, /confirm180, /auto60, /preview60 (optionally suffixed with @BotName in groups)
+_DELETION_CMD_RE = re.compile(r'^/(confirm|auto|preview)?(\d+)(?:@(\w+))?$')
+
+# Number of background workers downloading and analyzing images (also the cap on concurrent downloads)
+_IMAGE_WORKERS = 4
+# Images waiting per worker before photo handlers start waiting for room (backpressure under floods)
+_IMAGE_QUEUE_SIZE = 50
+
+# How often changed user state is written to the database (seconds)
+_USER_FLUSH_INTERVAL = 5
+
+# Human-readable reasons shown to users for each violation type
+_VIOLATION_LABELS = {
+    "vulgar_content": "inappropriate content",
+    "competitor_content": "competitor name",
+    "screenshot_threat": "threatening content",
+    "spam_pattern": "spam/promotional pattern",
+    "commercial_spam": "commercial promotion",
+    "promotional_pattern": "promotional content",
+}
+
+# How long a channel admin lookup is trusted before asking Telegram again (seconds)
+_ADMIN_CACHE_TTL = 300
+# Failed lookups are treated as "not admin" for a shorter window so a flood of messages doesn't retry each time
+_ADMIN_ERROR_CACHE_TTL = 30
+
+# How long a computed trust score is reused before recalculating (seconds)
+_TRUST_CACHE_TTL = 60
+# Trust scores are whole numbers, so time-in-channel is worked out in integer seconds
+_SECONDS_PER_DAY = 86400
+
+# Strong references to background tasks so they can't be garbage collected mid-run
+_BG_TASKS = set()
+
+def _log_task_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.error(f"Background task failed: {task.exception()}")
+
+def spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine without awaiting it, keeping it referenced until it finishes"""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    task.add_done_callback(_log_task_error)
+    return task
+
+# Message templates for the timer deletion commands (filled in with str.format)
+_DELETION_RESULT_TEMPLATE = """
+✅ **Deletion Complete**
+
+⏰ **Time Range:** Messages older than {minutes} minutes ({time_str})
+🗑️ **Deletion requested:** {deleted_count} messages (may include ones that were already gone)
+⚠️ **Errors/Skipped:** {error_count} (includes admin messages and non-existent messages)
+
+🔒 **Note:** Admin messages and system messages are automatically protected.
+ℹ️ **Method:** Bulk deletion with error handling for protected content.
+"""
+
+_DELETION_PREVIEW_TEMPLATE = """
+🔍 **Accurate Deletion Preview**
+
+⏰ **Time Range:** Messages older than {minutes} minutes ({time_str})
+📅 **Cutoff Time:** {cutoff_time}
+
+📊 **EXACT Impact (from message history):**
+🗑️ **Will delete:** {delete_count} messages
+🛡️ **Will skip:** {newer_messages} newer messages
+📈 **Total tracked:** {total_messages} messages
+📜 **Oldest tracked:** {oldest_age:.1f} hours ago
+
+📋 **Method:**
+• ✅ Real timestamp verification (not estimation)
+• ✅ Zero API calls for analysis
+• ✅ Instant accurate preview
+• ✅ Admin messages automatically protected
+
+💡 **To proceed:** Use `/{minutes}` to delete these messages
+⚠️ **Large deletion?** Commands >180 minutes require `/confirm{minutes}`
+
+🔒 **Safety Features:**
+• Admin message protection: ✅
+• Precise time-based targeting: ✅
+• Rate limiting during deletion: ✅  
+• Message history tracking: ✅
+
+⚡ **Performance:** {api_calls} bulk deletion API calls (ultra-fast)
+🎯 **Accuracy:** 100% (based on stored message data)
+"""
+
+_PREVIEW_NOTHING_TEMPLATE = "\n\n✅ **Result:** No messages older than {time_str} found - nothing to delete!"
+
+def format_duration(minutes: int) -> str:
+    """Format minutes as '2h 30m' (or '45m' under an hour)"""
+    hours, mins = divmod(minutes, 60)
+    return f"{hours}h {mins}m" if hours > 0 else f"{mins}m"
+
 class ModerationBot:
     def __init__(self):
         self.content_filter = ContentFilter()
         self.image_analyzer = ImageAnalyzer()
-        # Add connection settings for better reliability
+        self.rate_limiter = TelegramRateLimiter()  # Shared throttle for deletions and group posts
+        # The bot's only HTTP client (file downloads reuse it); long polling gets its own small pool
+        request = HTTPXRequest(
+            connection_pool_size=64,
+            http_version="2",
+            connect_timeout=60,
+            read_timeout=60,
+            pool_timeout=60
+        )
+        get_updates_request = HTTPXRequest(
+            connection_pool_size=4,
+            http_version="2",
+            connect_timeout=60,
+            read_timeout=60,
+            pool_timeout=60
+        )
         self.application = (Application.builder()
                            .token(Config.BOT_TOKEN)
-                           .connect_timeout(60)
-                           .read_timeout(60)
-                           .pool_timeout(60)
-                           .connection_pool_size(10)
+                           .request(request)
+                           .get_updates_request(get_updates_request)
                            .post_init(self.start_background_tasks)
                            .post_shutdown(self.cleanup_background_tasks)
                            .build())
-        self.user_warnings = {}  # Track warnings per user
-        self.user_violations = {}  # Track detailed violation history
-        self.user_trust_scores = {}  # Track user trust scores (0-100)
-        self.user_join_dates = {}  # Track when users joined
-        self.auto_deletion_tasks = {}  # Track active auto-deletion tasks: {chat_id: {minutes: task}}
-        self.message_history = {}  # Track message IDs and timestamps: {message_id: datetime}
+        # Track warnings, violations, trust and join date per user: {user_id: UserState}
+        # Bounded so a long-running bot doesn't grow without limit
+        self.users = LRUDict(on_evict=self.forget_user)
+        self.trust_level_counts = {"TRUSTED": 0, "GOOD": 0, "NEUTRAL": 0, "MONITORED": 0, "RESTRICTED": 0}
+        self.user_db = UserDatabase(Config.USER_DB_PATH)  # Persists self.users across restarts
+        self.dirty_users = set()  # Users changed since the last database flush
+        self.evicted_dirty_users = {}  # Evicted before their changes were flushed: {user_id: UserState}
+        self.user_flush_task = None  # Will be started when bot runs
+        self.keyword_count = len(Config.VULGAR_WORDS) + len(Config.COMPETITOR_KEYWORDS) + len(Config.SCREENSHOT_INDICATORS)
+        self.auto_deletion_tasks = {}  # Track active auto-deletion tasks: {(chat_id, minutes): task}
+        self.message_history = {}  # Track message IDs and timestamps: {message_id: epoch seconds}
+        self._admin_cache = {}  # Cached channel admin lookups: {user_id: (is_admin, expires_at)}
         self.cleanup_task = None  # Will be started when bot runs
+        self.image_queues = [asyncio.Queue(maxsize=_IMAGE_QUEUE_SIZE) for _ in range(_IMAGE_WORKERS)]  # Pending image checks, one queue per worker
+        self.image_workers = []  # Will be started when bot runs
         self.setup_handlers()
         
     def setup_handlers(self):
+        # Handle edited messages (prevent bypass by editing) - registered first because the
+        # command and text filters below also match edits
+        self.application.add_handler(MessageHandler(
+            filters.UpdateType.EDITED, self.handle_any_edited_message, block=False
+        ))
+        
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("status", self.status_command))
@@ -51,39 +179,32 @@ class ModerationBot:
         
         # Timer-based deletion commands
         self.application.add_handler(MessageHandler(
-            filters.Regex(r'^/\d+$') & filters.TEXT, self.handle_timer_deletion
-        ))
-        self.application.add_handler(MessageHandler(
-            filters.Regex(r'^/confirm\d+$') & filters.TEXT, self.handle_confirm_deletion
-        ))
-        self.application.add_handler(MessageHandler(
-            filters.Regex(r'^/auto\d+$') & filters.TEXT, self.handle_auto_deletion
-        ))
-        self.application.add_handler(MessageHandler(
-            filters.Regex(r'^/preview\d+$') & filters.TEXT, self.handle_preview_deletion
+            filters.Regex(_DELETION_CMD_RE) & filters.TEXT, self.handle_deletion_command
         ))
         self.application.add_handler(CommandHandler("stop_auto", self.stop_auto_deletion_command))
         self.application.add_handler(CommandHandler("list_auto", self.list_auto_deletions_command))
         
+        # Content checks run as their own tasks (block=False) so a slow photo download
+        # doesn't hold up the updates behind it; admin commands above stay sequential
         self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, self.handle_text_message
+            filters.TEXT & ~filters.COMMAND, self.handle_text_message, block=False
         ))
         self.application.add_handler(MessageHandler(
-            filters.PHOTO, self.handle_photo_message
+            filters.PHOTO, self.handle_photo_message, block=False
         ))
         self.application.add_handler(MessageHandler(
-            filters.Document.ALL, self.handle_document_message
+            filters.Document.ALL, self.handle_document_message, block=False
+        ))
+        
+        # Forget cached admin status when a member's role changes
+        self.application.add_handler(ChatMemberHandler(
+            self.handle_chat_member_update, ChatMemberHandler.CHAT_MEMBER
         ))
         
         # Handle new members joining (using service messages)
         self.application.add_handler(MessageHandler(
             filters.StatusUpdate.NEW_CHAT_MEMBERS, self.handle_new_member_simple
         ))
-        
-        # Handle edited messages (prevent bypass by editing) - Use message group -1 to catch edits first
-        self.application.add_handler(MessageHandler(
-            filters.ALL, self.handle_any_edited_message
-        ), group=-1)
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not await self.is_admin(update.effective_user.id, context):
@@ -175,12 +296,13 @@ The bot automatically:
         if not await self.is_admin(update.effective_user.id, context):
             return
         
-        if not self.user_warnings:
+        warned_users = [(user_id, state.warnings) for user_id, state in self.users.items() if state.warnings]
+        if not warned_users:
             await update.message.reply_text("No users have warnings currently.")
             return
         
         warning_list = "📊 *Current User Warnings:*\n\n"
-        for user_id, warning_count in self.user_warnings.items():
+        for user_id, warning_count in warned_users:
             warning_list += f"• User ID: `{user_id}` - {warning_count}/3 warnings\n"
         
         await update.message.reply_text(warning_list, parse_mode=ParseMode.MARKDOWN)
@@ -195,8 +317,12 @@ The bot automatically:
         
         try:
             user_id = int(context.args[0])
-            if user_id in self.user_warnings:
-                del self.user_warnings[user_id]
+            await self.load_user(user_id)
+            state = self.users.get(user_id)
+            if state and state.warnings:
+                state.warnings = 0
+                state.trust_expires = 0.0
+                self.dirty_users.add(user_id)
                 await update.message.reply_text(f"✅ Warnings reset for user {user_id}")
             else:
                 await update.message.reply_text(f"User {user_id} has no warnings to reset.")
@@ -213,11 +339,13 @@ The bot automatically:
         # Track message for deletion purposes
         self.track_message(message)
         
-        if await self.is_admin(user.id, context):
+        # Configured admins are skipped without awaiting anything
+        if user.id in Config.ADMIN_IDS or await self.is_admin(user.id, context):
             return
         
         # Apply trust-based filtering
         user_id = user.id
+        await self.load_user(user_id)
         trust_score = self.calculate_trust_score(user_id)
         trust_level = self.get_trust_level(trust_score)
         
@@ -245,23 +373,13 @@ The bot automatically:
         # Track message for deletion purposes
         self.track_message(message)
         
-        if await self.is_admin(user.id, context):
+        # Configured admins are skipped without awaiting anything
+        if user.id in Config.ADMIN_IDS or await self.is_admin(user.id, context):
             return
         
-        try:
-            photo = message.photo[-1]
-            file = await context.bot.get_file(photo.file_id)
-            file_data = await file.download_as_bytearray()
-            
-            # Pass caption to analyzer for educational context detection
-            caption = message.caption if message.caption else ""
-            analysis = self.image_analyzer.analyze_image(bytes(file_data), caption)
-            
-            if not analysis["is_safe"]:
-                await self.handle_violation(message, analysis, "image", context)
-                
-        except Exception as e:
-            logger.error(f"Error processing photo: {e}")
+        # Download and analysis happen in the image workers so this handler returns immediately
+        photo = message.photo[-1]
+        await self.queue_image_analysis(message, context, photo.file_id, "image")
     
     async def handle_document_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = update.message
@@ -270,40 +388,67 @@ The bot automatically:
         # Track message for deletion purposes
         self.track_message(message)
         
-        if await self.is_admin(user.id, context):
+        # Configured admins are skipped without awaiting anything
+        if user.id in Config.ADMIN_IDS or await self.is_admin(user.id, context):
             return
         
         document = message.document
         if document.mime_type and document.mime_type.startswith('image/'):
+            await self.queue_image_analysis(message, context, document.file_id, "document")
+    
+    async def queue_image_analysis(self, message: Message, context: ContextTypes.DEFAULT_TYPE, file_id: str, content_type: str):
+        """Hand an image to the analysis workers - sharded by user so each user's images are checked in order"""
+        queue = self.image_queues[message.from_user.id % len(self.image_queues)]
+        # Waits only when this worker is already backed up
+        await queue.put((message, context, file_id, content_type))
+    
+    async def image_analysis_worker(self, queue: asyncio.Queue):
+        """Background worker that downloads and analyzes queued images"""
+        while True:
+            message, context, file_id, content_type = await queue.get()
             try:
-                file = await context.bot.get_file(document.file_id)
-                file_data = await file.download_as_bytearray()
-                
-                # Pass caption to analyzer for educational context detection
-                caption = message.caption if message.caption else ""
-                analysis = self.image_analyzer.analyze_image(bytes(file_data), caption)
-                
-                if not analysis["is_safe"]:
-                    await self.handle_violation(message, analysis, "document", context)
-                    
+                await self.analyze_image_message(message, context, file_id, content_type)
             except Exception as e:
-                logger.error(f"Error processing document: {e}")
+                logger.error(f"Error processing {content_type}: {e}")
+            finally:
+                queue.task_done()
+    
+    async def analyze_image_message(self, message: Message, context: ContextTypes.DEFAULT_TYPE, file_id: str, content_type: str):
+        file = await context.bot.get_file(file_id)
+        
+        # Download straight into the buffer the analyzer reads, avoiding bytearray -> bytes copies
+        image_buffer = io.BytesIO()
+        await file.download_to_memory(out=image_buffer)
+        image_buffer.seek(0)
+        
+        # Pass caption to analyzer for educational context detection
+        caption = message.caption if message.caption else ""
+        # Image analysis is CPU-bound - run it off the event loop (run_in_executor: to_thread needs Python 3.9)
+        analysis = await asyncio.get_running_loop().run_in_executor(
+            None, self.image_analyzer.analyze_image, image_buffer, caption
+        )
+        
+        if not analysis["is_safe"]:
+            await self.handle_violation(message, analysis, content_type, context)
     
     async def handle_violation(self, message: Message, analysis: dict, content_type: str, context: ContextTypes.DEFAULT_TYPE):
         user = message.from_user
         user_id = user.id
         
         try:
-            await message.delete()
+            await self.rate_limiter.run(
+                context.bot.delete_message,
+                chat_id=message.chat_id,
+                message_id=message.message_id
+            )
+            self.message_history.pop(message.message_id, None)  # Gone, so timer deletions shouldn't try it
             logger.info(f"Deleted {content_type} message from user {user_id} ({user.username})")
             
             # Track warnings and detailed violations for this user
-            if user_id not in self.user_warnings:
-                self.user_warnings[user_id] = 0
-                self.user_violations[user_id] = []
-            
-            self.user_warnings[user_id] += 1
-            warning_count = self.user_warnings[user_id]
+            await self.load_user(user_id)
+            state = self.get_user_state(user_id)
+            state.warnings += 1
+            warning_count = state.warnings
             
             # Record detailed violation info
             violation_info = {
@@ -311,26 +456,38 @@ The bot automatically:
                 "violations": analysis.get("violations", []),
                 "warning_number": warning_count
             }
-            self.user_violations[user_id].append(violation_info)
+            state.violations.append(violation_info)
+            
+            # Render the ban-report line now; history only ever grows, so it never needs rebuilding
+            violation_types = [v.get("type", "unknown") for v in violation_info["violations"]]
+            reason = f"{content_type} ({', '.join(violation_types)})" if violation_types else content_type
+            state.history_lines.append(f"• Violation {len(state.violations)}: {reason}")
+            self.dirty_users.add(user_id)
+            state.trust_expires = 0.0  # Warnings/violations changed
             
             # Send violation notification to admins
             violation_text = self.format_violation_message(analysis, user, content_type, warning_count)
             
-            for admin_id in Config.ADMIN_IDS:
-                try:
-                    await context.bot.send_message(
-                        chat_id=admin_id,
-                        text=violation_text,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to notify admin {admin_id}: {e}")
+            # Notify all admins concurrently
+            results = await asyncio.gather(*[
+                self.rate_limiter.run(
+                    context.bot.send_message,
+                    chat_id=admin_id,
+                    text=violation_text,
+                    parse_mode=ParseMode.MARKDOWN
+                )
+                for admin_id in Config.ADMIN_IDS
+            ], return_exceptions=True)
+            for admin_id, result in zip(Config.ADMIN_IDS, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to notify admin {admin_id}: {result}")
             
             # Warning system: 3 strikes and you're out
             if warning_count >= 3:
                 # Remove user from group
                 try:
-                    await context.bot.ban_chat_member(
+                    await self.rate_limiter.run(
+                        context.bot.ban_chat_member,
                         chat_id=message.chat_id,
                         user_id=user_id
                     )
@@ -352,21 +509,25 @@ The bot automatically:
 ⚖️ **BOT PARAMETERS:**
 • Warning System: 3-strike policy
 • Auto-moderation: Active  
-• Content Filter: {len(Config.VULGAR_WORDS + Config.COMPETITOR_KEYWORDS + Config.SCREENSHOT_INDICATORS)} keywords monitored
+• Content Filter: {self.keyword_count} keywords monitored
 
 Contact admins if you believe this was an error.
                     """
                     
-                    await context.bot.send_message(
+                    await self.rate_limiter.run(
+                        context.bot.send_message,
+                        per_chat=True,
                         chat_id=message.chat_id,
                         text=final_warning,
                         parse_mode=ParseMode.MARKDOWN
                     )
                     
                     # Reset warnings and violations (user is removed)
-                    del self.user_warnings[user_id]
-                    if user_id in self.user_violations:
-                        del self.user_violations[user_id]
+                    state.warnings = 0
+                    state.violations = []
+                    state.history_lines = []
+                    self.dirty_users.add(user_id)
+                    state.trust_expires = 0.0
                     
                     logger.info(f"User {user_id} ({user.username}) removed after 3 warnings")
                     
@@ -379,24 +540,9 @@ Contact admins if you believe this was an error.
                 
                 # Get specific violation details for the warning
                 violation_details = []
-                if "violations" in analysis:
-                    for violation in analysis["violations"]:
-                        v_type = violation.get("type", "unknown")
-                        
-                        if v_type == "vulgar_content":
-                            violation_details.append("inappropriate content")
-                        elif v_type == "competitor_content":
-                            violation_details.append("competitor name")
-                        elif v_type == "screenshot_threat":
-                            violation_details.append("threatening content")
-                        elif v_type == "spam_pattern":
-                            violation_details.append("spam/promotional pattern")
-                        elif v_type == "commercial_spam":
-                            violation_details.append("commercial promotion")
-                        elif v_type == "promotional_pattern":
-                            violation_details.append("promotional content")
-                        else:
-                            violation_details.append(v_type.replace("_", " "))
+                for violation in analysis.get("violations", ()):
+                    v_type = violation.get("type", "unknown")
+                    violation_details.append(_VIOLATION_LABELS.get(v_type) or v_type.replace("_", " "))
                 
                 reason_text = "; ".join(violation_details) if violation_details else "rule violation"
                 
@@ -407,7 +553,9 @@ Contact admins if you believe this was an error.
 📝 **{warnings_left} more violations = PERMANENT BAN**
                 """
                 
-                await context.bot.send_message(
+                await self.rate_limiter.run(
+                    context.bot.send_message,
+                    per_chat=True,
                     chat_id=message.chat_id,
                     text=warning_text,
                     parse_mode=ParseMode.MARKDOWN
@@ -417,10 +565,7 @@ Contact admins if you believe this was an error.
             logger.error(f"Error handling violation: {e}")
     
     def format_violation_message(self, analysis: dict, user, content_type: str, warning_count: int = 1) -> str:
-        violation_types = []
-        if "violations" in analysis:
-            for violation in analysis["violations"]:
-                violation_types.append(violation["type"])
+        violation_types = [violation["type"] for violation in analysis.get("violations", ())]
         
         action_text = "Message deleted and user warned" if warning_count < 3 else "Message deleted and user REMOVED"
         
@@ -452,6 +597,7 @@ Action: {action_text}
             
             # Initialize new user trust score
             user_id = new_user.id
+            await self.load_user(user_id)
             self.calculate_trust_score(user_id)  # This will initialize them
             
             welcome_message = f"""
@@ -464,7 +610,9 @@ Good luck with your preparation! 🚀
             """
             
             try:
-                await context.bot.send_message(
+                await self.rate_limiter.run(
+                    context.bot.send_message,
+                    per_chat=True,
                     chat_id=message.chat_id,
                     text=welcome_message,
                     parse_mode=ParseMode.MARKDOWN
@@ -475,14 +623,10 @@ Good luck with your preparation! 🚀
     
     async def handle_any_edited_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle any edited message - delete it to prevent bypass"""
-        # Only process if this is an edited message
-        if not update.edited_message:
-            return
-            
-        message = update.edited_message
+        message = update.effective_message
         user = update.effective_user
         
-        if not message or not user or await self.is_admin(user.id, context):
+        if not message or not user or user.id in Config.ADMIN_IDS or await self.is_admin(user.id, context):
             return
         
         try:
@@ -499,10 +643,12 @@ Good luck with your preparation! 🚀
             
             logger.info(f"Detected edited {msg_type} message from user {user.id} ({user.username})")
             
-            await context.bot.delete_message(
+            await self.rate_limiter.run(
+                context.bot.delete_message,
                 chat_id=message.chat_id,
                 message_id=message.message_id
             )
+            self.message_history.pop(message.message_id, None)  # Gone, so timer deletions shouldn't try it
             
             # Send gentle warning about editing (no violation count)
             warning_text = f"""
@@ -512,7 +658,9 @@ Good luck with your preparation! 🚀
 💡 Tip: Send a new message if you need to correct something
             """
             
-            await context.bot.send_message(
+            await self.rate_limiter.run(
+                context.bot.send_message,
+                per_chat=True,
                 chat_id=message.chat_id,
                 text=warning_text,
                 parse_mode=ParseMode.MARKDOWN
@@ -525,56 +673,94 @@ Good luck with your preparation! 🚀
     
     def get_user_violation_history(self, user_id: int) -> str:
         """Generate detailed violation history for user removal message"""
-        if user_id not in self.user_violations:
+        state = self.users.get(user_id)
+        if not state or not state.history_lines:
             return "• No detailed history available"
         
-        history = []
-        for i, violation in enumerate(self.user_violations[user_id], 1):
-            violation_types = []
-            for v in violation.get("violations", []):
-                violation_types.append(v.get("type", "unknown"))
-            
-            if violation_types:
-                reason = f"{violation['type']} ({', '.join(violation_types)})"
-            else:
-                reason = violation['type']
-            
-            history.append(f"• Violation {i}: {reason}")
-        
-        return '\n'.join(history)
+        return '\n'.join(state.history_lines)
     
     def calculate_trust_score(self, user_id: int) -> int:
         """Calculate user trust score (0-100)"""
-        import time
+        # Initialize new user (starts with neutral score)
+        state = self.get_user_state(user_id)
         
-        # Initialize new user
-        if user_id not in self.user_trust_scores:
-            self.user_trust_scores[user_id] = 50  # Start with neutral score
-            self.user_join_dates[user_id] = time.time()
+        # Reuse a recent result - inputs only change on violations
+        if state.trust_expires > time.monotonic():
+            return state.trust_score
         
         base_score = 50
-        current_time = time.time()
-        join_time = self.user_join_dates.get(user_id, current_time)
+        current_time = int(time.time())
+        join_time = state.join_date
         
         # Time-based trust (more days = more trust)
-        days_in_channel = (current_time - join_time) / (24 * 60 * 60)
-        time_bonus = min(20, days_in_channel * 2)  # Max 20 points for 10+ days
+        time_bonus = min(20, (current_time - join_time) * 2 // _SECONDS_PER_DAY)  # Max 20 points for 10+ days
         
         # Violation penalty
-        violations = len(self.user_violations.get(user_id, []))
+        violations = len(state.violations)
         violation_penalty = violations * 15  # -15 per violation
         
         # Warning penalty
-        warnings = self.user_warnings.get(user_id, 0)
+        warnings = state.warnings
         warning_penalty = warnings * 10  # -10 per warning
         
         # Calculate final score
         trust_score = base_score + time_bonus - violation_penalty - warning_penalty
         trust_score = max(0, min(100, trust_score))  # Keep between 0-100
         
-        self.user_trust_scores[user_id] = trust_score
+        self.set_trust_score(state, trust_score)
+        state.trust_expires = time.monotonic() + _TRUST_CACHE_TTL
         return trust_score
     
+    def set_trust_score(self, state: UserState, trust_score: int):
+        """Store a user's trust score, moving them between trust level counts if needed"""
+        new_level = self.get_trust_level(trust_score)
+        if new_level != state.trust_level:
+            if state.trust_level:
+                self.trust_level_counts[state.trust_level] -= 1
+            self.trust_level_counts[new_level] += 1
+            state.trust_level = new_level
+        state.trust_score = trust_score
+    
+    def forget_user(self, user_id: int, state: UserState):
+        """Drop an evicted user from the trust level counts"""
+        if state.trust_level:
+            self.trust_level_counts[state.trust_level] -= 1
+            state.trust_level = None
+        # Unsaved changes still have to reach the database
+        if user_id in self.dirty_users:
+            self.evicted_dirty_users[user_id] = state
+    
+    async def load_user(self, user_id: int):
+        """Bring a user's saved state back into self.users if they were evicted or not loaded at startup"""
+        if user_id in self.users:
+            return
+        
+        state = self.evicted_dirty_users.pop(user_id, None)
+        if state is None and self.user_db.db:
+            try:
+                state = await self.user_db.load_user(user_id)
+            except Exception as e:
+                logger.error(f"Error loading user {user_id}: {e}")
+                return
+            # Another handler may have loaded or created them while we waited
+            if state is None or user_id in self.users:
+                return
+        elif state is None:
+            return
+        
+        self.set_trust_score(state, state.trust_score)
+        self.users[user_id] = state
+    
+    def get_user_state(self, user_id: int) -> UserState:
+        """Get a user's tracked state, starting to track them if needed"""
+        state = self.users.get(user_id)
+        if state is None:
+            state = UserState(join_date=int(time.time()))
+            self.set_trust_score(state, state.trust_score)
+            self.users[user_id] = state
+            self.dirty_users.add(user_id)
+        return state
+    
     def get_trust_level(self, trust_score: int) -> str:
         """Get trust level description"""
         if trust_score >= 80:
@@ -604,6 +790,7 @@ Good luck with your preparation! 🚀
         
         try:
             user_id = int(context.args[0])
+            await self.load_user(user_id)
             
             if len(context.args) == 1:
                 # View trust score
@@ -611,14 +798,14 @@ Good luck with your preparation! 🚀
                 trust_level = self.get_trust_level(trust_score)
                 
                 # Get user info
-                violations = len(self.user_violations.get(user_id, []))
-                warnings = self.user_warnings.get(user_id, 0)
+                state = self.get_user_state(user_id)
+                violations = len(state.violations)
+                warnings = state.warnings
                 
                 # Calculate days in channel
-                import time
                 current_time = time.time()
-                join_time = self.user_join_dates.get(user_id, current_time)
-                days_in_channel = (current_time - join_time) / (24 * 60 * 60)
+                join_time = state.join_date
+                days_in_channel = (current_time - join_time) / _SECONDS_PER_DAY
                 
                 trust_info = f"""
 📊 **Trust Score Report**
@@ -642,7 +829,10 @@ Good luck with your preparation! 🚀
                     await update.message.reply_text("Trust score must be between 0 and 100")
                     return
                 
-                self.user_trust_scores[user_id] = new_score
+                state = self.get_user_state(user_id)
+                self.set_trust_score(state, new_score)
+                self.dirty_users.add(user_id)
+                state.trust_expires = 0.0
                 trust_level = self.get_trust_level(new_score)
                 
                 await update.message.reply_text(
@@ -658,15 +848,10 @@ Good luck with your preparation! 🚀
         if not await self.is_admin(update.effective_user.id, context):
             return
         
-        # Count users by trust level
-        trust_levels = {"TRUSTED": 0, "GOOD": 0, "NEUTRAL": 0, "MONITORED": 0, "RESTRICTED": 0}
+        # Users by trust level (kept up to date as scores are recalculated)
+        trust_levels = self.trust_level_counts
         
-        for user_id in self.user_trust_scores:
-            score = self.calculate_trust_score(user_id)
-            level = self.get_trust_level(score)
-            trust_levels[level] += 1
-        
-        total_users = len(self.user_trust_scores)
+        total_users = len(self.users)
         
         trust_info = f"""
 🛡️ **Trust System Overview**
@@ -703,15 +888,36 @@ Use `/trust <user_id>` to view individual scores
         
         # If context is provided, check if user is channel admin
         if context:
+            cached = self._admin_cache.get(user_id)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            
             try:
                 chat_member = await context.bot.get_chat_member(Config.CHANNEL_ID, user_id)
-                return chat_member.status in ['creator', 'administrator']
+                is_channel_admin = chat_member.status in ['creator', 'administrator']
             except Exception as e:
                 logger.error(f"Error checking admin status for user {user_id}: {e}")
+                self._admin_cache[user_id] = (False, time.monotonic() + _ADMIN_ERROR_CACHE_TTL)
                 return False
+            
+            self._admin_cache[user_id] = (is_channel_admin, time.monotonic() + _ADMIN_CACHE_TTL)
+            return is_channel_admin
         
         return False
     
+    async def handle_chat_member_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Drop cached admin status when a member is promoted, demoted or leaves"""
+        member_update = update.chat_member
+        if member_update:
+            self._admin_cache.pop(member_update.new_chat_member.user.id, None)
+    
+    def cleanup_admin_cache(self):
+        """Remove expired admin lookups"""
+        now = time.monotonic()
+        expired = [user_id for user_id, (_, expires_at) in self._admin_cache.items() if expires_at <= now]
+        for user_id in expired:
+            del self._admin_cache[user_id]
+    
     def is_admin_sync(self, user_id: int) -> bool:
         """Synchronous version for backwards compatibility"""
         return user_id in Config.ADMIN_IDS
@@ -719,16 +925,21 @@ Use `/trust <user_id>` to view individual scores
     def track_message(self, message: Message):
         """Track message ID and timestamp for deletion purposes"""
         if message and message.message_id and message.date:
-            self.message_history[message.message_id] = message.date
+            # Re-insert rather than overwrite: the history scans stop at the first recent entry,
+            # so a reused ID (IDs repeat across groups) must move to the end with its new date
+            self.message_history.pop(message.message_id, None)
+            self.message_history[message.message_id] = message.date.timestamp()
     
     def cleanup_old_message_history(self):
         """Remove message history older than 48 hours (Telegram's deletion limit)"""
-        cutoff = datetime.now() - timedelta(hours=48)
+        cutoff_ts = time.time() - 48 * 3600
         to_remove = []
         
-        for msg_id, msg_date in self.message_history.items():
-            if msg_date < cutoff:
-                to_remove.append(msg_id)
+        # History is filled as messages arrive, so it is in date order - stop at the first recent one
+        for msg_id, msg_ts in self.message_history.items():
+            if msg_ts >= cutoff_ts:
+                break
+            to_remove.append(msg_id)
         
         for msg_id in to_remove:
             del self.message_history[msg_id]
@@ -736,18 +947,32 @@ Use `/trust <user_id>` to view individual scores
         if to_remove:
             logger.info(f"Cleaned up {len(to_remove)} old message records from history")
     
-    def get_messages_older_than(self, cutoff_time: datetime) -> list:
-        """Get list of message IDs older than cutoff_time"""
+    def get_messages_older_than(self, cutoff_ts: float) -> list:
+        """Get list of message IDs older than cutoff_ts (epoch seconds)"""
         old_messages = []
-        for msg_id, msg_date in self.message_history.items():
-            if msg_date < cutoff_time:
-                old_messages.append(msg_id)
+        # Oldest messages come first, so the scan ends at the first one newer than the cutoff.
+        # Repeated auto-deletion runs only walk the messages still pending, not the whole history.
+        for msg_id, msg_ts in self.message_history.items():
+            if msg_ts >= cutoff_ts:
+                break
+            old_messages.append(msg_id)
         return old_messages
     
     async def start_background_tasks(self, application):
         """Initialize background tasks after the application is ready"""
+        # Restore user state saved before the last restart
+        await self.user_db.connect()
+        for user_id, state in await self.user_db.load_users():
+            self.set_trust_score(state, state.trust_score)
+            self.users[user_id] = state
+        logger.info(f"Loaded {len(self.users)} users from {Config.USER_DB_PATH}")
+        self.user_flush_task = asyncio.create_task(self.user_flush_loop())
+        
         self.cleanup_task = asyncio.create_task(self.periodic_cleanup_task())
         logger.info("Background cleanup task started")
+        
+        self.image_workers = [asyncio.create_task(self.image_analysis_worker(queue)) for queue in self.image_queues]
+        logger.info(f"Started {len(self.image_workers)} image analysis workers")
     
     async def cleanup_background_tasks(self, application):
         """Clean up background tasks before shutdown"""
@@ -760,26 +985,68 @@ Use `/trust <user_id>` to view individual scores
                 pass
             logger.info("Background cleanup task stopped")
         
+        # Stop image analysis workers
+        for worker in self.image_workers:
+            worker.cancel()
+        await asyncio.gather(*self.image_workers, return_exceptions=True)
+        self.image_workers = []
+        
         # Stop all auto-deletion tasks
-        for chat_id, chat_tasks in self.auto_deletion_tasks.items():
-            for minutes, task in chat_tasks.items():
-                if not task.done():
-                    task.cancel()
-                    try:
-                        await task
-                    except asyncio.CancelledError:
-                        pass
-                    logger.info(f"Auto-deletion task stopped: {minutes}m for chat {chat_id}")
+        for (chat_id, minutes), task in list(self.auto_deletion_tasks.items()):
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                logger.info(f"Auto-deletion task stopped: {minutes}m for chat {chat_id}")
         
         self.auto_deletion_tasks.clear()
+        
+        # Write out any pending user changes
+        if self.user_flush_task and not self.user_flush_task.done():
+            self.user_flush_task.cancel()
+            try:
+                await self.user_flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush_dirty_users()
+        await self.user_db.close()
+        
         logger.info("All background tasks cleaned up")
     
+    async def user_flush_loop(self):
+        """Background task that writes changed users to the database in batches"""
+        while True:
+            await asyncio.sleep(_USER_FLUSH_INTERVAL)
+            try:
+                await self.flush_dirty_users()
+            except Exception as e:
+                logger.error(f"Error saving user state: {e}")
+    
+    async def flush_dirty_users(self):
+        """Save every user changed since the last flush in one transaction"""
+        if not self.dirty_users or not self.user_db.db:
+            return
+        dirty, self.dirty_users = self.dirty_users, set()
+        evicted, self.evicted_dirty_users = self.evicted_dirty_users, {}
+        users = [(user_id, self.users.peek(user_id) or evicted.get(user_id)) for user_id in dirty]
+        users = [(user_id, state) for user_id, state in users if state is not None]
+        try:
+            await self.user_db.save_users(users)
+        except Exception:
+            # Keep them pending so the next flush retries
+            self.dirty_users |= dirty
+            self.evicted_dirty_users.update(evicted)
+            raise
+    
     async def periodic_cleanup_task(self):
-        """Background task to clean up old message history every hour"""
+        """Background task to clean up old message history and expired admin lookups every hour"""
         try:
             while True:
                 await asyncio.sleep(3600)  # Wait 1 hour
                 self.cleanup_old_message_history()
+                self.cleanup_admin_cache()
         except asyncio.CancelledError:
             logger.info("Periodic cleanup task cancelled")
             raise  # Re-raise to properly handle cancellation
@@ -787,93 +1054,62 @@ Use `/trust <user_id>` to view individual scores
             logger.error(f"Error in periodic cleanup: {e}")
             # Don't restart on unexpected errors during shutdown
     
-    async def handle_timer_deletion(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle timer-based deletion commands like /60, /120"""
-        if not await self.is_admin(update.effective_user.id, context):
-            await update.message.reply_text("❌ Only admins can use timer deletion commands.")
+    async def handle_deletion_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle timer deletion commands like /60, /confirm180, /auto60, /preview60"""
+        # Extract action and minutes from command (e.g., /auto60 -> "auto", 60)
+        match = _DELETION_CMD_RE.match(update.message.text.strip())
+        if not match:
+            await update.message.reply_text("⚠️ Invalid command format.")
             return
         
-        # Extract minutes from command (e.g., /60 -> 60)
-        command_text = update.message.text.strip()
-        minutes = int(command_text[1:])  # Remove the '/' and convert to int
-        
-        # Validate time range
-        if not (5 <= minutes <= 1440):  # 5 minutes to 24 hours
-            await update.message.reply_text("⚠️ Time must be between 5 minutes and 24 hours (1440 minutes)")
+        # /60@OtherBot is meant for a different bot - ignore it, like CommandHandler does
+        bot_name = match.group(3)
+        if bot_name and bot_name.lower() != (context.bot.username or "").lower():
             return
         
-        # Confirm large deletions
-        if minutes > 180:  # More than 3 hours
-            confirm_msg = f"⚠️ **LARGE DELETION WARNING**\n\nThis will delete all messages older than **{minutes} minutes** ({minutes//60}h {minutes%60}m).\n\nType `/confirm{minutes}` to proceed."
-            await update.message.reply_text(confirm_msg, parse_mode=ParseMode.MARKDOWN)
-            return
-        
-        await self.delete_messages_by_time(update.message.chat_id, minutes, context, update.effective_user.id)
-    
-    async def handle_confirm_deletion(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle confirmation for large deletions like /confirm180"""
         if not await self.is_admin(update.effective_user.id, context):
             await update.message.reply_text("❌ Only admins can use timer deletion commands.")
             return
         
-        # Extract minutes from command (e.g., /confirm180 -> 180)
-        command_text = update.message.text.strip()
-        minutes = int(command_text[8:])  # Remove '/confirm' and convert to int
-        
-        # Validate time range
-        if not (5 <= minutes <= 1440):  # 5 minutes to 24 hours
-            await update.message.reply_text("⚠️ Time must be between 5 minutes and 24 hours (1440 minutes)")
-            return
-        
-        await update.message.reply_text(f"✅ **Confirmed!** Proceeding with deletion of messages older than {minutes} minutes...", parse_mode=ParseMode.MARKDOWN)
-        await self.delete_messages_by_time(update.message.chat_id, minutes, context, update.effective_user.id)
-    
-    async def handle_auto_deletion(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle auto-deletion commands like /auto60, /auto120"""
-        if not await self.is_admin(update.effective_user.id, context):
-            await update.message.reply_text("❌ Only admins can use auto-deletion commands.")
-            return
-        
-        # Extract minutes from command (e.g., /auto60 -> 60)
-        command_text = update.message.text.strip()
-        minutes = int(command_text[5:])  # Remove '/auto' and convert to int
-        
-        # Validate time range
-        if not (10 <= minutes <= 1440):  # 10 minutes to 24 hours
-            await update.message.reply_text("⚠️ Auto-deletion time must be between 10 minutes and 24 hours (1440 minutes)")
-            return
-        
+        action = match.group(1)
+        minutes = int(match.group(2))
         chat_id = update.message.chat_id
+        admin_id = update.effective_user.id
         
-        # Check if auto-deletion already exists for this time
-        if chat_id in self.auto_deletion_tasks and minutes in self.auto_deletion_tasks[chat_id]:
-            await update.message.reply_text(f"⚠️ Auto-deletion for {minutes} minutes is already active. Use `/stop_auto {minutes}` to stop it first.")
+        # Validate time range: 5 minutes (10 for auto-deletion) to 24 hours
+        min_minutes = 10 if action == "auto" else 5
+        if not (min_minutes <= minutes <= 1440):
+            await update.message.reply_text(f"⚠️ Time must be between {min_minutes} minutes and 24 hours (1440 minutes)")
             return
         
-        # Start auto-deletion task
-        await self.start_auto_deletion(chat_id, minutes, context, update.effective_user.id)
+        if action == "preview":
+            await self.preview_deletion(chat_id, minutes, context, admin_id)
         
-        await update.message.reply_text(
-            f"✅ **Auto-deletion started**\n\nMessages older than **{minutes} minutes** will be automatically deleted every 10 minutes.\n\nUse `/stop_auto {minutes}` to stop this auto-deletion.",
-            parse_mode=ParseMode.MARKDOWN
-        )
-    
-    async def handle_preview_deletion(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle preview deletion commands like /preview60"""
-        if not await self.is_admin(update.effective_user.id, context):
-            await update.message.reply_text("❌ Only admins can use preview commands.")
-            return
-        
-        # Extract minutes from command (e.g., /preview60 -> 60)
-        command_text = update.message.text.strip()
-        minutes = int(command_text[8:])  # Remove '/preview' and convert to int
+        elif action == "auto":
+            # Check if auto-deletion already exists for this time
+            if (chat_id, minutes) in self.auto_deletion_tasks:
+                await update.message.reply_text(f"⚠️ Auto-deletion for {minutes} minutes is already active. Use `/stop_auto {minutes}` to stop it first.")
+                return
+            
+            await self.start_auto_deletion(chat_id, minutes, context, admin_id)
+            
+            await update.message.reply_text(
+                f"✅ **Auto-deletion started**\n\nMessages older than **{minutes} minutes** will be automatically deleted every 10 minutes.\n\nUse `/stop_auto {minutes}` to stop this auto-deletion.",
+                parse_mode=ParseMode.MARKDOWN
+            )
         
-        # Validate time range
-        if not (5 <= minutes <= 1440):
-            await update.message.reply_text("⚠️ Preview time must be between 5 minutes and 24 hours (1440 minutes)")
-            return
+        elif action == "confirm":
+            await update.message.reply_text(f"✅ **Confirmed!** Proceeding with deletion of messages older than {minutes} minutes...", parse_mode=ParseMode.MARKDOWN)
+            await self.delete_messages_by_time(chat_id, minutes, context, admin_id)
         
-        await self.preview_deletion(update.message.chat_id, minutes, context, update.effective_user.id)
+        else:
+            # Confirm large deletions
+            if minutes > 180:  # More than 3 hours
+                confirm_msg = f"⚠️ **LARGE DELETION WARNING**\n\nThis will delete all messages older than **{minutes} minutes** ({minutes // 60}h {minutes % 60}m).\n\nType `/confirm{minutes}` to proceed."
+                await update.message.reply_text(confirm_msg, parse_mode=ParseMode.MARKDOWN)
+                return
+            
+            await self.delete_messages_by_time(chat_id, minutes, context, admin_id)
     
     async def stop_auto_deletion_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Stop specific auto-deletion or all auto-deletions"""
@@ -885,16 +1121,19 @@ Use `/trust <user_id>` to view individual scores
         
         if len(context.args) == 0:
             # Stop all auto-deletions
-            if chat_id not in self.auto_deletion_tasks or not self.auto_deletion_tasks[chat_id]:
+            chat_keys = [key for key in self.auto_deletion_tasks if key[0] == chat_id]
+            if not chat_keys:
                 await update.message.reply_text("ℹ️ No auto-deletions are currently active.")
                 return
             
+            chat_tasks = [self.auto_deletion_tasks.pop(key) for key in chat_keys]
             stopped_tasks = []
-            for minutes, task in list(self.auto_deletion_tasks[chat_id].items()):
+            for (_, minutes), task in zip(chat_keys, chat_tasks):
                 task.cancel()
                 stopped_tasks.append(str(minutes))
             
-            del self.auto_deletion_tasks[chat_id]
+            # Wait for cancellation to finish so the tasks release their references
+            await asyncio.gather(*chat_tasks, return_exceptions=True)
             
             await update.message.reply_text(f"✅ Stopped all auto-deletions: {', '.join(stopped_tasks)} minutes")
             
@@ -903,16 +1142,16 @@ Use `/trust <user_id>` to view individual scores
             try:
                 minutes = int(context.args[0])
                 
-                if chat_id not in self.auto_deletion_tasks or minutes not in self.auto_deletion_tasks[chat_id]:
+                task = self.auto_deletion_tasks.pop((chat_id, minutes), None)
+                if task is None:
                     await update.message.reply_text(f"ℹ️ No auto-deletion for {minutes} minutes is active.")
                     return
                 
-                self.auto_deletion_tasks[chat_id][minutes].cancel()
-                del self.auto_deletion_tasks[chat_id][minutes]
-                
-                # Clean up empty dict
-                if not self.auto_deletion_tasks[chat_id]:
-                    del self.auto_deletion_tasks[chat_id]
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
                 
                 await update.message.reply_text(f"✅ Stopped auto-deletion for {minutes} minutes")
                 
@@ -929,19 +1168,14 @@ Use `/trust <user_id>` to view individual scores
         
         chat_id = update.message.chat_id
         
-        if chat_id not in self.auto_deletion_tasks or not self.auto_deletion_tasks[chat_id]:
+        active_deletions = sorted(minutes for task_chat_id, minutes in self.auto_deletion_tasks if task_chat_id == chat_id)
+        if not active_deletions:
             await update.message.reply_text("ℹ️ No auto-deletions are currently active.")
             return
         
-        active_deletions = list(self.auto_deletion_tasks[chat_id].keys())
-        active_deletions.sort()
-        
         deletion_list = "🤖 **Active Auto-Deletions:**\n\n"
         for minutes in active_deletions:
-            hours = minutes // 60
-            mins = minutes % 60
-            time_str = f"{hours}h {mins}m" if hours > 0 else f"{mins}m"
-            deletion_list += f"• **{minutes} minutes** ({time_str})\n"
+            deletion_list += f"• **{minutes} minutes** ({format_duration(minutes)})\n"
         
         deletion_list += f"\n📊 Total: **{len(active_deletions)}** active auto-deletions"
         deletion_list += "\n\n💡 Use `/stop_auto <minutes>` to stop specific ones"
@@ -950,47 +1184,46 @@ Use `/trust <user_id>` to view individual scores
     
     async def delete_messages_by_time(self, chat_id: int, minutes: int, context: ContextTypes.DEFAULT_TYPE, admin_id: int):
         """Delete messages older than specified minutes"""
-        cutoff_time = datetime.now() - timedelta(minutes=minutes)
+        cutoff_ts = time.time() - minutes * 60
         
         try:
             # Send progress message
-            progress_msg = await context.bot.send_message(
+            progress_msg = await self.rate_limiter.run(
+                context.bot.send_message,
+                per_chat=True,
                 chat_id=chat_id,
                 text=f"🔄 **Deleting messages older than {minutes} minutes...**\n\n⏳ Please wait...",
                 parse_mode=ParseMode.MARKDOWN
             )
             
             # Use the practical deletion approach
-            result = await self.get_recent_messages_for_deletion(chat_id, cutoff_time, context)
+            result = await self.get_recent_messages_for_deletion(chat_id, cutoff_ts, context, progress_msg.message_id)
             
             # Update progress message with results
-            hours = minutes // 60
-            mins = minutes % 60
-            time_str = f"{hours}h {mins}m" if hours > 0 else f"{mins}m"
-            
-            result_text = f"""
-✅ **Deletion Complete**
-
-⏰ **Time Range:** Messages older than {minutes} minutes ({time_str})
-🗑️ **Deleted:** {result['deleted_count']} messages
-⚠️ **Errors/Skipped:** {result['error_count']} (includes admin messages and non-existent messages)
-
-🔒 **Note:** Admin messages and system messages are automatically protected.
-ℹ️ **Method:** Bulk deletion with error handling for protected content.
-            """
+            result_text = _DELETION_RESULT_TEMPLATE.format(
+                minutes=minutes,
+                time_str=format_duration(minutes),
+                deleted_count=result['deleted_count'],
+                error_count=result['error_count']
+            )
             
-            await context.bot.edit_message_text(
+            # Don't hold the command up on the final edit
+            spawn_background(self.rate_limiter.run(
+                context.bot.edit_message_text,
+                per_chat=True,
                 chat_id=chat_id,
                 message_id=progress_msg.message_id,
                 text=result_text,
                 parse_mode=ParseMode.MARKDOWN
-            )
+            ))
             
-            logger.info(f"Timer deletion completed by admin {admin_id}: {result['deleted_count']} messages deleted ({minutes} minutes)")
+            logger.info(f"Timer deletion completed by admin {admin_id}: {result['deleted_count']} deletions requested ({minutes} minutes)")
             
         except Exception as e:
             logger.error(f"Error in timer deletion: {e}")
-            await context.bot.send_message(
+            await self.rate_limiter.run(
+                context.bot.send_message,
+                per_chat=True,
                 chat_id=chat_id,
                 text=f"❌ **Deletion failed:** {str(e)}",
                 parse_mode=ParseMode.MARKDOWN
@@ -1000,20 +1233,22 @@ Use `/trust <user_id>` to view individual scores
         """Preview what messages would be deleted without actually deleting them - FAST & ACCURATE"""
         try:
             # Send progress message
-            progress_msg = await context.bot.send_message(
+            progress_msg = await self.rate_limiter.run(
+                context.bot.send_message,
+                per_chat=True,
                 chat_id=chat_id,
                 text=f"🔍 **Previewing deletion for {minutes} minutes...**\n\n⏳ Analyzing message history...",
                 parse_mode=ParseMode.MARKDOWN
             )
             
             # Calculate cutoff time
-            cutoff_time = datetime.now() - timedelta(minutes=minutes)
+            cutoff_ts = time.time() - minutes * 60
             
             # Clean up old message history first
             self.cleanup_old_message_history()
             
             # Get list of message IDs older than cutoff
-            old_message_ids = self.get_messages_older_than(cutoff_time)
+            old_message_ids = self.get_messages_older_than(cutoff_ts)
             
             # Count messages by age ranges for detailed preview
             total_messages = len(self.message_history)
@@ -1023,60 +1258,42 @@ Use `/trust <user_id>` to view individual scores
             if old_message_ids:
                 oldest_msg_id = min(old_message_ids)
                 oldest_timestamp = self.message_history[oldest_msg_id]
-                oldest_age = (datetime.now() - oldest_timestamp).total_seconds() / 3600  # hours
+                oldest_age = (time.time() - oldest_timestamp) / 3600  # hours
             else:
                 oldest_age = 0
             
-            hours = minutes // 60
-            mins = minutes % 60
-            time_str = f"{hours}h {mins}m" if hours > 0 else f"{mins}m"
+            time_str = format_duration(minutes)
             
-            preview_text = f"""
-🔍 **Accurate Deletion Preview**
-
-⏰ **Time Range:** Messages older than {minutes} minutes ({time_str})
-📅 **Cutoff Time:** {cutoff_time.strftime("%H:%M:%S")}
-
-📊 **EXACT Impact (from message history):**
-🗑️ **Will delete:** {len(old_message_ids)} messages
-🛡️ **Will skip:** {newer_messages} newer messages
-📈 **Total tracked:** {total_messages} messages
-📜 **Oldest tracked:** {oldest_age:.1f} hours ago
-
-📋 **Method:**
-• ✅ Real timestamp verification (not estimation)
-• ✅ Zero API calls for analysis
-• ✅ Instant accurate preview
-• ✅ Admin messages automatically protected
-
-💡 **To proceed:** Use `/{minutes}` to delete these messages
-⚠️ **Large deletion?** Commands >180 minutes require `/confirm{minutes}`
-
-🔒 **Safety Features:**
-• Admin message protection: ✅
-• Precise time-based targeting: ✅
-• Rate limiting during deletion: ✅  
-• Message history tracking: ✅
-
-⚡ **Performance:** {len(old_message_ids)} deletion API calls (ultra-fast)
-🎯 **Accuracy:** 100% (based on stored message data)
-            """
+            preview_text = _DELETION_PREVIEW_TEMPLATE.format(
+                minutes=minutes,
+                time_str=time_str,
+                cutoff_time=time.strftime("%H:%M:%S", time.localtime(cutoff_ts)),
+                delete_count=len(old_message_ids),
+                newer_messages=newer_messages,
+                total_messages=total_messages,
+                oldest_age=oldest_age,
+                api_calls=(len(old_message_ids) + 99) // 100
+            )
             
             if len(old_message_ids) == 0:
-                preview_text += "\n\n✅ **Result:** No messages older than {time_str} found - nothing to delete!"
+                preview_text += _PREVIEW_NOTHING_TEMPLATE.format(time_str=time_str)
             
-            await context.bot.edit_message_text(
+            spawn_background(self.rate_limiter.run(
+                context.bot.edit_message_text,
+                per_chat=True,
                 chat_id=chat_id,
                 message_id=progress_msg.message_id,
                 text=preview_text,
                 parse_mode=ParseMode.MARKDOWN
-            )
+            ))
             
             logger.info(f"Accurate preview completed by admin {admin_id}: {len(old_message_ids)} deletable, {newer_messages} newer ({minutes} minutes)")
             
         except Exception as e:
             logger.error(f"Error in preview deletion: {e}")
-            await context.bot.send_message(
+            await self.rate_limiter.run(
+                context.bot.send_message,
+                per_chat=True,
                 chat_id=chat_id,
                 text=f"❌ **Preview failed:** {str(e)}",
                 parse_mode=ParseMode.MARKDOWN
@@ -1085,40 +1302,61 @@ Use `/trust <user_id>` to view individual scores
     async def start_auto_deletion(self, chat_id: int, minutes: int, context: ContextTypes.DEFAULT_TYPE, admin_id: int):
         """Start auto-deletion task for specified minutes - uses efficient message history"""
         async def auto_delete_task():
+            failures = 0
             while True:
                 try:
                     # Wait 10 minutes before first run and between runs
                     await asyncio.sleep(600)  # 10 minutes
                     
                     # Check if task is still in our tracking dict (might be cancelled)
-                    if (chat_id not in self.auto_deletion_tasks or 
-                        minutes not in self.auto_deletion_tasks[chat_id]):
+                    if (chat_id, minutes) not in self.auto_deletion_tasks:
                         break
                     
                     # Perform deletion using efficient stored message approach
-                    cutoff_time = datetime.now() - timedelta(minutes=minutes)
-                    result = await self.get_recent_messages_for_deletion(chat_id, cutoff_time, context)
+                    cutoff_ts = time.time() - minutes * 60
+                    result = await self.get_recent_messages_for_deletion(chat_id, cutoff_ts, context)
+                    
+                    # The deletion helper reports errors in its result rather than raising; only real
+                    # failures count here, not skips of messages that are already gone or protected
+                    if result['deleted_count'] == 0 and result['failed_count'] > 0:
+                        raise RuntimeError(f"none of the deletions succeeded ({result['failed_count']} failed)")
                     
                     if result['deleted_count'] > 0:
-                        logger.info(f"Auto-deletion ({minutes}m): {result['deleted_count']} messages deleted from chat {chat_id}")
+                        logger.info(f"Auto-deletion ({minutes}m): {result['deleted_count']} deletions requested in chat {chat_id}")
                     elif result['deleted_count'] == 0:
                         logger.debug(f"Auto-deletion ({minutes}m): No old messages to delete in chat {chat_id}")
+                    
+                    failures = 0
                         
                 except asyncio.CancelledError:
                     logger.info(f"Auto-deletion task cancelled for {minutes} minutes in chat {chat_id}")
                     break
                 except Exception as e:
                     logger.error(f"Error in auto-deletion task ({minutes}m): {e}")
-                    # Continue running despite errors
+                    del e  # Drop the traceback so it doesn't pin frames between runs
+                    failures += 1
+                    
+                    # Give up after repeated failures (e.g. bot lost admin rights)
+                    if failures >= 5:
+                        logger.error(f"Auto-deletion ({minutes}m) stopped after {failures} consecutive failures in chat {chat_id}")
+                        break
+                    
+                    # Back off before the next attempt (capped at 1 hour)
+                    try:
+                        await asyncio.sleep(min(600 * 2 ** failures, 3600))
+                    except asyncio.CancelledError:
+                        logger.info(f"Auto-deletion task cancelled for {minutes} minutes in chat {chat_id}")
+                        break
+            
+            # Stop tracking this task once it exits on its own
+            if self.auto_deletion_tasks.get((chat_id, minutes)) is asyncio.current_task():
+                del self.auto_deletion_tasks[(chat_id, minutes)]
         
         # Create and start the task
-        task = asyncio.create_task(auto_delete_task())
+        task = spawn_background(auto_delete_task())
         
         # Store the task
-        if chat_id not in self.auto_deletion_tasks:
-            self.auto_deletion_tasks[chat_id] = {}
-        
-        self.auto_deletion_tasks[chat_id][minutes] = task
+        self.auto_deletion_tasks[(chat_id, minutes)] = task
         
         logger.info(f"Efficient auto-deletion started by admin {admin_id}: {minutes} minutes in chat {chat_id}")
     
@@ -1131,14 +1369,16 @@ Use `/trust <user_id>` to view individual scores
             # First, let's get the latest message ID by sending a dummy message and then deleting it
             try:
                 # Send a temporary message to get current message ID
-                temp_msg = await context.bot.send_message(
+                temp_msg = await self.rate_limiter.run(
+                    context.bot.send_message,
+                    per_chat=True,
                     chat_id=chat_id,
                     text="🔄 Scanning..."
                 )
                 current_msg_id = temp_msg.message_id
                 
                 # Delete the temporary message
-                await context.bot.delete_message(chat_id=chat_id, message_id=current_msg_id)
+                await self.rate_limiter.run(context.bot.delete_message, chat_id=chat_id, message_id=current_msg_id)
                 
                 # Now iterate backwards from this message ID
                 for msg_id in range(current_msg_id - 1, max(0, current_msg_id - 10000), -1):
@@ -1163,80 +1403,128 @@ Use `/trust <user_id>` to view individual scores
             logger.error(f"Error in get_chat_history: {e}")
     
     # Let's implement a different approach using message tracking
-    async def get_recent_messages_for_deletion(self, chat_id: int, cutoff_time: datetime, context: ContextTypes.DEFAULT_TYPE):
-        """Delete messages older than cutoff_time using stored message history - FAST & EFFICIENT"""
+    async def get_recent_messages_for_deletion(self, chat_id: int, cutoff_ts: float, context: ContextTypes.DEFAULT_TYPE, progress_message_id: int = None):
+        """Delete messages older than cutoff_ts (epoch seconds) using stored message history - FAST & EFFICIENT
+        
+        If progress_message_id is given, that message is edited with live counts every 500 messages.
+        """
         try:
             # Clean up old message history first
             self.cleanup_old_message_history()
             
             # Get list of message IDs older than cutoff
-            old_message_ids = self.get_messages_older_than(cutoff_time)
+            old_message_ids = self.get_messages_older_than(cutoff_ts)
             
-            logger.info(f"Target: Delete all messages OLDER than {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            logger.info(f"Target: Delete all messages OLDER than {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cutoff_ts))}")
             logger.info(f"Found {len(old_message_ids)} messages in history older than cutoff")
             logger.info(f"Total messages in history: {len(self.message_history)}")
             
             if not old_message_ids:
-                return {"deleted_count": 0, "admin_skipped": 0, "error_count": 0}
+                return {"deleted_count": 0, "admin_skipped": 0, "error_count": 0, "failed_count": 0}
             
             # Sort message IDs for better deletion order (oldest first)
             old_message_ids.sort()
             
-            deleted_messages = []
+            deleted_count = 0
             error_count = 0
+            failed_count = 0  # Errors that may succeed on a later run (network, lost rights), as opposed to skips
+            progress_task = None
             
-            # Delete each old message
-            for msg_id in old_message_ids:
+            # Loop invariants, looked up once rather than per message
+            total = len(old_message_ids)
+            report_progress = total > 100
+            message_history = self.message_history
+            run_limited = self.rate_limiter.run
+            
+            # Delete in batches of up to 100 messages per deleteMessages call
+            for i in range(0, total, 100):
+                batch = old_message_ids[i:i + 100]
                 try:
-                    await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-                    deleted_messages.append(msg_id)
-                    
-                    # Remove from our tracking since it's deleted
-                    if msg_id in self.message_history:
-                        del self.message_history[msg_id]
+                    # Rate limiting (and RetryAfter back-off) handled by the shared limiter
+                    await run_limited(context.bot.delete_messages, chat_id=chat_id, message_ids=batch)
+                    # deleteMessages silently skips messages that are already gone, so this counts requests
+                    deleted_count += len(batch)
                     
-                    # Rate limiting: pause every 30 deletions
-                    if len(deleted_messages) % 30 == 0:
-                        await asyncio.sleep(1)
-                        
-                except Exception as e:
-                    error_count += 1
-                    error_str = str(e).lower()
+                    # Remove from our tracking since they're deleted
+                    for msg_id in batch:
+                        message_history.pop(msg_id, None)
                     
-                    if "message to delete not found" in error_str:
-                        # Message already deleted or doesn't exist, clean from our history
-                        if msg_id in self.message_history:
-                            del self.message_history[msg_id]
-                    elif "message can't be deleted" in error_str:
-                        # Probably admin message or system message, keep in history
-                        logger.debug(f"Cannot delete message {msg_id} (admin/system message)")
-                    else:
-                        logger.warning(f"Failed to delete message {msg_id}: {e}")
+                except BadRequest as e:
+                    # Some message in the batch can't be deleted (admin/system message) - retry one by one
+                    logger.debug(f"Bulk deletion failed, falling back to single deletions: {e}")
+                    for msg_id in batch:
+                        try:
+                            await run_limited(context.bot.delete_message, chat_id=chat_id, message_id=msg_id)
+                            deleted_count += 1
+                            
+                            # Remove from our tracking since it's deleted
+                            message_history.pop(msg_id, None)
+                                
+                        except BadRequest as e:
+                            error_count += 1
+                            error_str = str(e).lower()
+                            
+                            if "message to delete not found" in error_str:
+                                # Message already deleted or doesn't exist, clean from our history
+                                message_history.pop(msg_id, None)
+                            elif "message can't be deleted" in error_str:
+                                # Probably admin message or system message - it never will be, so stop retrying it
+                                message_history.pop(msg_id, None)
+                                logger.debug(f"Cannot delete message {msg_id} (admin/system message)")
+                            else:
+                                logger.warning(f"Failed to delete message {msg_id}: {e}")
+                        except TelegramError as e:
+                            # Network hiccup, timeout or Forbidden - skip this message, it stays in history for the next run
+                            error_count += 1
+                            failed_count += 1
+                            logger.warning(f"Failed to delete message {msg_id}: {e}")
+                except (Forbidden, TelegramError) as e:
+                    # Lost rights, timeout or network error - count the batch as failed and move on;
+                    # its messages stay in history for the next run
+                    error_count += len(batch)
+                    failed_count += len(batch)
+                    logger.warning(f"Bulk deletion of {len(batch)} messages failed: {e}")
                 
                 # Progress indicator for large deletions
-                if len(old_message_ids) > 100 and (len(deleted_messages) + error_count) % 50 == 0:
-                    progress = len(deleted_messages) + error_count
-                    logger.info(f"Deletion progress: {progress}/{len(old_message_ids)} processed")
+                if report_progress:
+                    progress = deleted_count + error_count
+                    logger.info(f"Deletion progress: {progress}/{total} processed")
+                    
+                    # Live count for the admin, without waiting on the edit
+                    if progress_message_id and progress % 500 == 0 and progress < total:
+                        progress_task = spawn_background(run_limited(
+                            context.bot.edit_message_text,
+                            per_chat=True,
+                            chat_id=chat_id,
+                            message_id=progress_message_id,
+                            text=f"🔄 **Deleting messages...**\n\n⏳ {progress}/{total} processed",
+                            parse_mode=ParseMode.MARKDOWN
+                        ))
+            
+            # Let the last progress edit land before the caller posts the final result
+            if progress_task and not progress_task.done():
+                await asyncio.wait([progress_task])
             
             logger.info(f"Efficient deletion complete:")
             logger.info(f"  - Target messages (older than cutoff): {len(old_message_ids)}")
-            logger.info(f"  - Successfully deleted: {len(deleted_messages)}")
+            logger.info(f"  - Deletion requested (not exact for bulk batches): {deleted_count}")
             logger.info(f"  - Errors/protected: {error_count}")
-            logger.info(f"  - Success rate: {(len(deleted_messages)/len(old_message_ids)*100):.1f}%")
             
             return {
-                "deleted_count": len(deleted_messages),
+                "deleted_count": deleted_count,
                 "admin_skipped": error_count,
-                "error_count": error_count
+                "error_count": error_count,
+                "failed_count": failed_count
             }
             
         except Exception as e:
             logger.error(f"Error in efficient message deletion: {e}")
-            return {"deleted_count": 0, "admin_skipped": 0, "error_count": 1}
+            return {"deleted_count": 0, "admin_skipped": 0, "error_count": 1, "failed_count": 1}
     
     def run(self):
         logger.info("Starting NEET Channel Moderation Bot...")
-        self.application.run_polling()
+        # chat_member updates are not delivered unless requested explicitly
+        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == "__main__":
     bot = ModerationBot()
@@ -0,0 +1,81 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+class TelegramRateLimiter:
+    """Keep Bot API calls under Telegram's limits (30/sec globally, 20/min per group)
+    and pause every queued call when Telegram answers with RetryAfter"""
+
+    def __init__(self, global_rate: int = 30, per_chat_per_minute: int = 20):
+        self.global_interval = 1 / global_rate
+        self.per_chat_per_minute = per_chat_per_minute
+        self.paused = asyncio.Event()
+        self.paused.set()  # Set means "running"; cleared while Telegram asks us to back off
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+        self._chat_windows = {}  # {chat_id: deque of send times in the last minute}
+
+    async def run(self, method, per_chat: bool = False, **kwargs):
+        """Call a Bot API method (e.g. context.bot.delete_message) under the rate limits"""
+        chat_id = kwargs.get("chat_id") if per_chat else None
+
+        while True:
+            await self._acquire(chat_id)
+            try:
+                return await method(**kwargs)
+            except RetryAfter as e:
+                logger.warning(f"Rate limited by Telegram, pausing all calls for {e.retry_after}s")
+                await self._pause(e.retry_after)
+
+    async def _acquire(self, chat_id=None):
+        while True:
+            await self.paused.wait()
+
+            # Only bookkeeping happens under the lock; waits happen outside it so one
+            # busy chat can't hold up calls for every other chat
+            async with self._lock:
+                now = time.monotonic()
+                chat_wait = 0
+                window = None
+
+                # Per-chat sliding window (only for group posts)
+                if chat_id is not None:
+                    window = self._chat_windows.setdefault(chat_id, deque())
+                    while window and now - window[0] >= 60:
+                        window.popleft()
+                    if len(window) >= self.per_chat_per_minute:
+                        chat_wait = 60 - (now - window[0])
+
+                if not chat_wait:
+                    # Reserve the next global slot (and this chat's window entry) for this call
+                    slot = max(now, self._next_slot)
+                    self._next_slot = slot + self.global_interval
+                    if window is not None:
+                        window.append(slot)
+                    break
+
+            # Chat is at its limit - wait for its oldest send to leave the window, then try again
+            await asyncio.sleep(chat_wait)
+
+        # Global spacing between calls
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+        # A RetryAfter may have arrived while we were waiting for a slot
+        await self.paused.wait()
+
+    async def _pause(self, retry_after):
+        if not self.paused.is_set():
+            # Another call already triggered the pause, just wait for it to lift
+            await self.paused.wait()
+            return
+
+        self.paused.clear()
+        try:
+            await asyncio.sleep(retry_after)
+        finally:
+            self.paused.set()
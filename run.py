@@ -1,58 +1,205 @@
 #!/usr/bin/env python3
 
 import sys
+
+# Shown before anything else is imported so the console responds immediately
+_SEP = "=" * 45
+_BANNER = "🛡️ NEET Channel Moderation Bot v2.0\n" + _SEP + "\n"
+if __name__ == "__main__":
+    sys.stdout.write(_BANNER)
+    sys.stdout.flush()
+
 import os
-from pathlib import Path
+import hashlib
+
+# Under `python -S` (the ./bot launcher) site is skipped; put back the directories it would have
+# added (venv or system site-packages, Debian's dist-packages, the user site) as plain sys.path
+# entries, so their .pth files are never read. Everything in requirements.txt works that way, but
+# editable installs (pip install -e) and other packages that rely on a .pth file won't import -
+# use `python run.py` for those setups
+if sys.flags.no_site:
+    import site  # Importing site under -S doesn't run site.main()
+    _prefix = os.path.dirname(os.path.dirname(os.path.abspath(sys.executable)))
+    _venv_cfg = os.path.join(_prefix, 'pyvenv.cfg')
+    _site_dirs = []
+    if os.path.exists(_venv_cfg):
+        # Fixed venv layout - Debian's patched getsitepackages() would point at dist-packages here
+        if os.name == 'nt':
+            _site_dirs.append(os.path.join(_prefix, 'Lib', 'site-packages'))
+        else:
+            _site_dirs.append(os.path.join(_prefix, 'lib', f"python{sys.version_info[0]}.{sys.version_info[1]}", 'site-packages'))
+        with open(_venv_cfg) as _f:
+            _system_site = any(
+                line.replace(' ', '').lower() == 'include-system-site-packages=true\n' for line in _f
+            )
+        if _system_site:
+            _site_dirs += site.getsitepackages([sys.base_prefix])
+    else:
+        if site.check_enableusersite():
+            _site_dirs.append(site.getusersitepackages())
+        _site_dirs += site.getsitepackages([sys.prefix])
+    for _path in _site_dirs:
+        if _path not in sys.path and os.path.isdir(_path):
+            sys.path.append(_path)
+
+import importlib.util
+
+# .env next to this script, and the module it is compiled into so later runs skip dotenv parsing
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+_ENV_MODULE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_env_cache.py')
+
+# Top-level modules the bot needs installed
+_REQUIRED_MODULES = ("telegram", "h2", "cv2", "PIL", "dotenv", "aiosqlite")
+# A passed requirements check is remembered here, per requirements.txt contents and interpreter
+_REQUIREMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requirements.txt')
+_CHECKS_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'neet_bot')
+
+# Appended to the startup error, written with a single call
+_TROUBLESHOOT = (
+    "\n🔧 Troubleshooting:\n"
+    "1. Check your internet connection\n"
+    "2. Verify bot token in .env file\n"
+    "3. Make sure bot isn't already running\n"
+)
+
+def __getattr__(name):
+    # Load the bot (telegram, OpenCV, PIL) only when it is first used, not on import
+    if name == "ModerationBot":
+        from moderation_bot import ModerationBot
+        return ModerationBot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def check_requirements():
-    try:
-        import telegram
-        import cv2
-        import PIL
-        import dotenv
-        print("✅ All required packages are installed")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing package: {e}")
+    # find_spec only locates the packages; the bot import below is the first and only one that
+    # loads them, and sys.modules keeps them loaded from then on
+    missing = [name for name in _REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing packages: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✅ All required packages are installed")
+    return True
 
-def check_config():
-    # Load environment variables directly (works on Railway)
-    import os
-    from dotenv import load_dotenv
+def _install_uvloop():
+    """Use uvloop's libuv event loop for polling and dispatch when it is installed"""
+    try:
+        import uvloop
+    except ImportError:
+        return False  # Optional (not available on Windows) - the default asyncio loop still works
+    import asyncio
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+def _load_env_cached():
+    """Load .env into os.environ via a generated _env_cache.py, whose .pyc Python keeps for us"""
+    # open() doubles as the existence check - no separate exists()/stat() call before reading
+    try:
+        with open(_ENV_FILE, 'rb') as f:
+            env_data = f.read()
+    except FileNotFoundError:
+        return  # No .env (e.g. Railway) - everything comes from the real environment
     
-    load_dotenv()  # Load .env file
+    # Freshness is decided by content, not mtime: mtimes survive copies (rsync -a) and .pyc
+    # checks only see whole seconds plus size, so a quick same-length edit could look unchanged
+    env_hash = hashlib.sha256(env_data).hexdigest()
+    values = None
+    try:
+        import _env_cache
+        if _env_cache.ENV_HASH == env_hash:
+            values = _env_cache.VALUES
+    except Exception:
+        pass  # Missing, or written by an older run.py
     
-    bot_token = os.getenv('BOT_TOKEN')
-    admin_ids = os.getenv('ADMIN_IDS')
-    channel_id = os.getenv('CHANNEL_ID')
+    if values is None:
+        import io
+        from dotenv import dotenv_values
+        parsed = dotenv_values(stream=io.StringIO(env_data.decode('utf-8')))
+        values = {k: v for k, v in parsed.items() if v is not None}
+        source = (
+            "# Generated by run.py from .env - do not edit, delete to regenerate\n"
+            f"ENV_HASH = {env_hash!r}\n"
+            f"VALUES = {values!r}\n"
+        )
+        try:
+            # Holds the bot token, so only the owner may read it; os.replace keeps the swap atomic
+            tmp_path = f"{_ENV_MODULE}.{os.getpid()}.tmp"
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                f.write(source)
+            os.replace(tmp_path, _ENV_MODULE)
+            # Drop the old bytecode so the next start can't pick it up for the new source
+            os.remove(importlib.util.cache_from_source(_ENV_MODULE))
+        except OSError:
+            pass  # Read-only checkout or no old .pyc - the values parsed above are still used
     
-    print(f"🔍 Checking environment variables...")
-    print(f"BOT_TOKEN: {'✅ Set' if bot_token else '❌ Missing'}")
-    print(f"ADMIN_IDS: {'✅ Set' if admin_ids else '❌ Missing'}")
-    print(f"CHANNEL_ID: {'✅ Set' if channel_id else '❌ Missing'}")
+    # Same precedence as load_dotenv(): variables already in the environment win
+    for k, v in values.items():
+        os.environ.setdefault(k, v)
+    os.environ['NEET_BOT_ENV_LOADED'] = '1'  # Tells config.py not to parse .env again
+
+def _requirements_marker():
+    """Path of the marker file for this requirements.txt + interpreter, or None if it can't be built"""
+    try:
+        with open(_REQUIREMENTS_FILE, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The module list is part of the key so adding a requirement invalidates old markers
+    key = hashlib.sha256(
+        data + sys.executable.encode() + sys.version.encode() + ",".join(_REQUIRED_MODULES).encode()
+    ).hexdigest()
+    return os.path.join(_CHECKS_CACHE_DIR, f"req_ok_{key}")
+
+def check_requirements_cached():
+    """check_requirements, skipped with --skip-checks or when it already passed for this setup"""
+    if "--skip-checks" in sys.argv:
+        return True
     
-    if not bot_token:
-        print("❌ BOT_TOKEN not set in environment variables")
+    marker = _requirements_marker()
+    if marker and os.path.exists(marker):
+        return True
+    
+    if not check_requirements():
         return False
     
-    if not admin_ids:
-        print("❌ ADMIN_IDS not set in environment variables")
+    if marker:
+        try:
+            os.makedirs(_CHECKS_CACHE_DIR, exist_ok=True)
+            open(marker, 'w').close()
+        except OSError:
+            pass  # Just means the check runs again next time
+    return True
+
+def check_config():
+    # Load environment variables directly (works on Railway)
+    _load_env_cached()
+    
+    try:
+        from config import Config
+    except ValueError as e:
+        # e.g. a non-numeric ADMIN_IDS or CHANNEL_ID
+        print(f"❌ Invalid configuration: {e}")
         return False
     
-    if not channel_id:
-        print("❌ CHANNEL_ID not set in environment variables")
+    snapshot = Config.snapshot()
+    missing = [name for name in snapshot._fields if not getattr(snapshot, name)]
+    
+    print(f"🔍 Checking environment variables...")
+    for name in snapshot._fields:
+        print(f"{name}: {'❌ Missing' if name in missing else '✅ Set'}")
+    
+    if missing:
+        print(f"❌ {', '.join(missing)} not set in environment variables")
         return False
     
     print("✅ All environment variables configured")
     return True
 
 def main():
-    print("🛡️ NEET Channel Moderation Bot v2.0")
-    print("=" * 45)
+    # Health check for systemd/k8s probes: validate and exit without importing the bot
+    if "--check-only" in sys.argv:
+        sys.exit(0 if check_requirements() and check_config() else 1)
     
-    if not check_requirements():
+    if not check_requirements_cached():
         sys.exit(1)
     
     if not check_config():
@@ -60,22 +207,35 @@ def main():
     
     print("🚀 Starting bot...")
     
+    running = False
     try:
-        from moderation_bot import ModerationBot
+        if _install_uvloop():
+            print("⚡ Using uvloop event loop")
+        ModerationBot = sys.modules[__name__].ModerationBot
         print("📡 Connecting to Telegram...")
         bot = ModerationBot()
         print("✅ Connected successfully!")
         print("🤖 Bot is now running... (Press Ctrl+C to stop)")
+        running = True
         bot.run()
     except KeyboardInterrupt:
+        if running:
+            # run_polling handles the first Ctrl+C itself, so this one cut its shutdown short
+            sys.stderr.write("\n⚠️ Shutdown interrupted - recent user changes may not have been saved\n")
+            sys.exit(130)
         print("\n⏹️ Bot stopped by user")
     except Exception as e:
-        print(f"❌ Error starting bot: {e}")
-        print("\n🔧 Troubleshooting:")
-        print("1. Check your internet connection")
-        print("2. Verify bot token in .env file")
-        print("3. Make sure bot isn't already running")
+        # One write so the report isn't interleaved with log lines on stderr
+        sys.stderr.write(f"❌ Error starting bot: {e}\n{_TROUBLESHOOT}")
+        sys.stderr.flush()
         sys.exit(1)
+    else:
+        # run_polling returns only after its shutdown (including the final user state save)
+        # has finished, so the interpreter's own teardown can be skipped
+        print("⏹️ Bot stopped")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
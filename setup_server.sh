@@ -61,7 +61,10 @@ After=network.target
 Type=simple
 User=$USER
 WorkingDirectory=$PROJECT_DIR
-ExecStart=$PROJECT_DIR/venv/bin/python $PROJECT_DIR/run.py
+# supervisor.py restarts the bot after a crash without reloading its imports;
+# KillMode=mixed sends SIGTERM only to the supervisor, which forwards it to the bot once
+ExecStart=$PROJECT_DIR/venv/bin/python $PROJECT_DIR/supervisor.py
+KillMode=mixed
 Restart=always
 RestartSec=10
 Environment=PATH=$PROJECT_DIR/venv/bin
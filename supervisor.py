@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import time
+import signal
+import traceback
+import run
+
+# Pause before starting a new bot process after a crash (same as RestartSec in the systemd unit)
+_RESTART_DELAY = 10
+# Give up after this many crashes in a row that each happened within _QUICK_CRASH_SECONDS of starting
+# (e.g. an invalid token) - restarting won't fix those, and systemd can take over from there
+_MAX_QUICK_CRASHES = 5
+_QUICK_CRASH_SECONDS = 60
+
+# Stop signals are held back while forking so one can't arrive before the child's pid is recorded
+_STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+class _StopRequested(Exception):
+    """Raised by the signal handler when a stop arrives while no bot is running"""
+
+class _ChildState:
+    pid = 0  # Running bot process, 0 between runs
+    stopping = False  # Set once SIGTERM/SIGINT has been received
+
+def _handle_stop_signal(signum, frame):
+    _ChildState.stopping = True
+    if _ChildState.pid:
+        # Pass it on and keep waiting - the bot shuts down (and saves user state) on its own
+        os.kill(_ChildState.pid, signum)
+    else:
+        raise _StopRequested()
+
+def run_child(bot_class):
+    """Body of a forked bot process - never returns to the supervisor loop"""
+    # Own process group, so a terminal Ctrl+C reaches only the supervisor, which forwards it once
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _STOP_SIGNALS)
+    
+    code = 0
+    try:
+        bot_class().run()
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        sys.stderr.write("❌ Bot crashed:\n")
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+def exit_code(status: int) -> int:
+    """os.waitstatus_to_exitcode for Python 3.8 - negative signal number if the child was killed"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+def main():
+    sys.stdout.write(run._BANNER)
+    
+    if not hasattr(os, "fork"):
+        # No fork on Windows - run the bot directly
+        run.main()
+        return
+    
+    if not run.check_requirements_cached():
+        sys.exit(1)
+    
+    if not run.check_config():
+        sys.exit(1)
+    
+    # Import telegram/OpenCV/PIL once here; each forked bot inherits them already loaded
+    run._install_uvloop()
+    from moderation_bot import ModerationBot
+    print("🚀 Starting bot under supervisor...")
+    
+    # Forward stop requests to the bot instead of dying and leaving it polling as an orphan
+    signal.signal(signal.SIGTERM, _handle_stop_signal)
+    signal.signal(signal.SIGINT, _handle_stop_signal)
+    
+    quick_crashes = 0
+    try:
+        while True:
+            # Otherwise the child inherits the buffered output and writes it a second time
+            sys.stdout.flush()
+            sys.stderr.flush()
+            
+            signal.pthread_sigmask(signal.SIG_BLOCK, _STOP_SIGNALS)
+            pid = os.fork()
+            if pid == 0:
+                run_child(ModerationBot)
+            _ChildState.pid = pid
+            started = time.monotonic()
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _STOP_SIGNALS)
+            
+            _, status = os.waitpid(pid, 0)
+            _ChildState.pid = 0
+            
+            code = exit_code(status)
+            if code == 0 or _ChildState.stopping:
+                print("⏹️ Bot stopped")
+                return
+            
+            if time.monotonic() - started < _QUICK_CRASH_SECONDS:
+                quick_crashes += 1
+            else:
+                quick_crashes = 1
+            if quick_crashes >= _MAX_QUICK_CRASHES:
+                sys.stderr.write(f"❌ Bot crashed {quick_crashes} times in a row right after starting - giving up\n")
+                sys.exit(1)
+            
+            print(f"⚠️ Bot exited with status {code}, restarting in {_RESTART_DELAY}s...")
+            time.sleep(_RESTART_DELAY)
+    except _StopRequested:
+        print("\n⏹️ Bot stopped by user")
+
+if __name__ == "__main__":
+    main()
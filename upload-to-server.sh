@@ -28,6 +28,8 @@ ssh $USERNAME@$DROPLET_IP "mkdir -p $BOT_DIR"
 # Upload all files except sensitive ones
 rsync -avz --progress \
     --exclude='.env' \
+    --exclude='_env_cache.py' \
+    --exclude='users.db*' \
     --exclude='__pycache__' \
     --exclude='*.pyc' \
     --exclude='.git' \
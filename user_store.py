@@ -0,0 +1,135 @@
+import json
+import time
+import aiosqlite
+from collections import OrderedDict
+
+# Per-user state is kept for at most this many users; the least recently active are forgotten first
+MAX_TRACKED_USERS = 50000
+
+class LRUDict(OrderedDict):
+    """Dict that keeps at most maxsize entries, evicting the least recently used"""
+
+    def __init__(self, maxsize: int = MAX_TRACKED_USERS, on_evict=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.on_evict = on_evict  # Called with (key, value) for each evicted entry
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def peek(self, key, default=None):
+        """Read an entry without marking it as recently used"""
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            evicted_key, evicted_value = self.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted_key, evicted_value)
+
+class UserState:
+    """Everything the bot tracks about one user"""
+    # Explicit __slots__ rather than dataclass(slots=True), which needs Python 3.10
+    __slots__ = ("warnings", "violations", "history_lines", "trust_score", "trust_level", "join_date", "trust_expires")
+
+    def __init__(self, warnings: int = 0, violations: list = None, history_lines: list = None,
+                 trust_score: int = 50, trust_level: str = None, join_date: int = 0, trust_expires: float = 0.0):
+        self.warnings = warnings
+        self.violations = violations if violations is not None else []  # Detailed violation history
+        self.history_lines = history_lines if history_lines is not None else []  # Pre-rendered "• Violation N: ..." lines for ban reports
+        self.trust_score = trust_score  # 0-100, starts neutral
+        self.trust_level = trust_level  # Level the user is counted under in the bot's trust_level_counts
+        self.join_date = join_date  # Epoch seconds when first seen
+        self.trust_expires = trust_expires  # time.monotonic() until which trust_score can be reused
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"UserState({fields})"
+
+class UserDatabase:
+    """SQLite (WAL) persistence for UserState so warnings and join dates survive restarts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = None
+
+    async def connect(self):
+        self.db = await aiosqlite.connect(self.path)
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                warnings INTEGER NOT NULL,
+                violations TEXT NOT NULL,
+                history_lines TEXT NOT NULL,
+                trust_score INTEGER NOT NULL,
+                join_date INTEGER NOT NULL,
+                last_seen REAL NOT NULL
+            )
+        """)
+        # Databases written before last_seen existed
+        async with self.db.execute("PRAGMA table_info(users)") as cursor:
+            columns = [row[1] for row in await cursor.fetchall()]
+        if "last_seen" not in columns:
+            await self.db.execute("ALTER TABLE users ADD COLUMN last_seen REAL NOT NULL DEFAULT 0")
+        await self.db.execute("CREATE INDEX IF NOT EXISTS users_last_seen ON users (last_seen)")
+        await self.db.commit()
+
+    @staticmethod
+    def _row_to_state(warnings, violations, history_lines, trust_score, join_date) -> UserState:
+        return UserState(
+            warnings=warnings,
+            violations=json.loads(violations),
+            history_lines=json.loads(history_lines),
+            trust_score=trust_score,
+            join_date=int(join_date)
+        )
+
+    async def load_users(self, limit: int = MAX_TRACKED_USERS) -> list:
+        """Return the most recently saved users as [(user_id, UserState)], least recent first"""
+        async with self.db.execute(
+            "SELECT user_id, warnings, violations, history_lines, trust_score, join_date FROM users "
+            "ORDER BY last_seen DESC LIMIT ?",
+            (limit,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [(row[0], self._row_to_state(*row[1:])) for row in reversed(rows)]
+
+    async def load_user(self, user_id: int):
+        """Return one saved user's UserState, or None if they were never saved"""
+        async with self.db.execute(
+            "SELECT warnings, violations, history_lines, trust_score, join_date FROM users WHERE user_id = ?",
+            (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return self._row_to_state(*row) if row else None
+
+    async def save_users(self, users: list):
+        """Write [(user_id, UserState)] in one transaction"""
+        # last_seen orders the rows so a restart reloads the most recently changed users
+        now = time.time()
+        rows = [
+            (user_id, state.warnings, json.dumps(state.violations), json.dumps(state.history_lines),
+             state.trust_score, state.join_date, now)
+            for user_id, state in users
+        ]
+        await self.db.executemany(
+            "INSERT OR REPLACE INTO users (user_id, warnings, violations, history_lines, trust_score, join_date, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        await self.db.commit()
+
+    async def close(self):
+        if self.db:
+            await self.db.close()
+            self.db = None